@@ -3,16 +3,22 @@
 
 import streamlit as st
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
 import yfinance as yf
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from datetime import datetime, timedelta
 import time
 from concurrent.futures import ThreadPoolExecutor, as_completed
-import io
 import json
 import base64
 import zipfile
-from io import BytesIO
+import tempfile
+
+# 중간 슬라이스/체인 연산에서 불필요한 복사 방지
+pd.options.mode.copy_on_write = True
 
 st.set_page_config(
     page_title="Stock Data Fetcher Pro", 
@@ -27,122 +33,305 @@ if 'filtered_df' not in st.session_state:
     st.session_state.filtered_df = None
 if 'stock_data' not in st.session_state:
     st.session_state.stock_data = {}
+if 'stock_data_period' not in st.session_state:
+    st.session_state.stock_data_period = None
+
+def is_rate_limited(error):
+    """오류 메시지로 Yahoo 429 (Too Many Requests) 여부 확인
+    
+    error는 예외 객체 또는 yf.shared._ERRORS에 기록된 문자열. 둘 다 메시지로만 판단.
+    """
+    return 'Too Many Requests' in str(error)
+
+def download_with_backoff(symbols, max_retries=3, **kwargs):
+    """yf.download 실행, 429(rate limit)로 실패한 종목만 지수 백오프 후 다시 받아 병합
+    
+    yf.download는 429를 예외로 올리지 않고 종목별 오류를 yf.shared._ERRORS에 기록하므로
+    호출 후 오류 메시지를 확인함. Retry-After 헤더는 yfinance가 노출하지 않아 2**attempt초 대기.
+    """
+    raw = yf.download(symbols, **kwargs)
+    pending = symbols
+    
+    for attempt in range(max_retries - 1):
+        # yfinance는 오류를 대문자 심볼로 기록
+        errors = getattr(getattr(yf, 'shared', None), '_ERRORS', None) or {}
+        limited = [symbol for symbol in pending if is_rate_limited(errors.get(symbol.upper(), ''))]
+        if not limited:
+            break
+        
+        time.sleep(2 ** attempt)
+        retry = yf.download(limited, **kwargs)
+        pending = limited
+        
+        if retry is None or retry.empty:
+            continue
+        
+        # 단일 종목 요청 시 구버전 yfinance는 MultiIndex 없이 반환
+        if not isinstance(retry.columns, pd.MultiIndex):
+            retry = pd.concat({limited[0]: retry}, axis=1)
+        
+        # 이미 받은 종목은 그대로 두고 재요청한 종목 데이터만 교체
+        if isinstance(raw.columns, pd.MultiIndex):
+            raw = pd.concat([raw.drop(columns=limited, level=0, errors='ignore'), retry], axis=1)
+        else:
+            raw = retry
+    
+    return raw
+
+@st.cache_resource
+def http_session():
+    """keep-alive 연결 풀과 429/5xx 재시도가 설정된 공용 requests 세션"""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=20,
+        pool_maxsize=50,
+        max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 502, 503])
+    )
+    session.mount('https://', adapter)
+    return session
+
+def read_symbol_directory(session, url, columns):
+    """NASDAQ Symbol Directory 파일을 응답 스트림에서 바로 파싱"""
+    with session.get(url, stream=True) as response:
+        response.raise_for_status()
+        response.raw.decode_content = True
+        return pd.read_csv(response.raw, sep='|', usecols=columns, dtype='string')
 
-@st.cache_data(ttl=86400)  # 24시간 캐시
-def download_nasdaq_tickers():
-    """NASDAQ 공식 사이트에서 티커 리스트 다운로드"""
+# persist="disk"는 ttl을 지원하지 않으므로 날짜(as_of)를 캐시 키로 사용해 하루 단위로 갱신
+# 실패는 예외로 전달해 디스크에 캐시되지 않도록 하고, 지난 날짜 항목은 max_entries로 정리
+@st.cache_data(persist="disk", max_entries=3)
+def download_nasdaq_tickers(as_of):
+    """NASDAQ 공식 사이트에서 티커 리스트 다운로드 (as_of: YYYYMMDD 캐시 키)"""
     with st.spinner("NASDAQ에서 티커 리스트 다운로드 중..."):
         nasdaq_url = "https://www.nasdaqtrader.com/dynamic/SymDir/nasdaqlisted.txt"
         other_url = "https://www.nasdaqtrader.com/dynamic/SymDir/otherlisted.txt"
         
+        # NASDAQ 상장 종목 / 기타 거래소 종목을 동시에 요청 (429 재시도는 세션이 처리)
+        session = http_session()
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            nasdaq_future = executor.submit(
+                read_symbol_directory, session, nasdaq_url,
+                ['Symbol', 'Security Name', 'Market Category', 'Test Issue']
+            )
+            other_future = executor.submit(
+                read_symbol_directory, session, other_url,
+                ['ACT Symbol', 'Security Name', 'Test Issue']
+            )
+            nasdaq_df = nasdaq_future.result()
+            other_df = other_future.result()
+        
+        # 필터링/컬럼 선택/이름 변경을 한 번에 처리
+        nasdaq_clean = (
+            nasdaq_df.loc[nasdaq_df['Test Issue'].eq('N'), ['Symbol', 'Security Name', 'Market Category']]
+            .assign(Exchange='NASDAQ')
+        )
+        other_clean = (
+            other_df.loc[other_df['Test Issue'].eq('N'), ['ACT Symbol', 'Security Name']]
+            .rename(columns={'ACT Symbol': 'Symbol'})
+            .assign(**{'Market Category': 'N/A', 'Exchange': 'OTHER'})
+        )
+        
+        # 합치기
+        combined_df = (
+            pd.concat([nasdaq_clean, other_clean], ignore_index=True)
+            .rename(columns={'Security Name': 'Name'})
+        )
+        
+        return combined_df
+
+# Ticker 객체는 fast_info 결과(발행주식수, 1년 가격)를 들고 있으므로 개수를 제한
+@st.cache_resource(ttl=86400, max_entries=500, show_spinner=False)
+def get_ticker(symbol):
+    """yf.Ticker 객체를 앱 전체에서 재사용 (HTTP 세션은 yfinance가 내부에서 공유)"""
+    return yf.Ticker(symbol)
+
+def get_symbol_frame(raw, symbol):
+    """yf.download(group_by='ticker') 결과에서 단일 종목 데이터 추출"""
+    # 단일 종목 요청 시 구버전 yfinance는 MultiIndex 없이 반환
+    if isinstance(raw.columns, pd.MultiIndex):
+        if symbol not in raw.columns.get_level_values(0):
+            return None
+        return raw[symbol].dropna(how='all')
+    return raw.dropna(how='all')
+
+def fetch_market_cap(ticker, max_retries=3):
+    """fast_info로 시가총액 가져오기 (무거운 전체 info 요청 생략, 실패 시 None)
+    
+    Rate limit(429) 예외일 때만 지수 백오프 후 재시도하고, 그 외 오류는 바로 실패 처리.
+    """
+    for attempt in range(max_retries):
         try:
-            # NASDAQ 상장 종목
-            nasdaq_response = requests.get(nasdaq_url)
-            nasdaq_df = pd.read_csv(io.StringIO(nasdaq_response.text), sep='|')
-            nasdaq_df = nasdaq_df[nasdaq_df['Test Issue'] == 'N']
-            nasdaq_df['Exchange'] = 'NASDAQ'
-            
-            # 기타 거래소 종목
-            other_response = requests.get(other_url)
-            other_df = pd.read_csv(io.StringIO(other_response.text), sep='|')
-            other_df = other_df[other_df['Test Issue'] == 'N']
-            other_df['Exchange'] = 'OTHER'
-            
-            # 필요한 컬럼만 선택하고 합치기
-            nasdaq_clean = nasdaq_df[['Symbol', 'Security Name', 'Market Category', 'Exchange']].copy()
-            other_clean = other_df[['ACT Symbol', 'Security Name', 'Exchange']].copy()
-            other_clean.rename(columns={'ACT Symbol': 'Symbol'}, inplace=True)
-            other_clean['Market Category'] = 'N/A'
-            
-            # 합치기
-            combined_df = pd.concat([nasdaq_clean, other_clean], ignore_index=True)
-            combined_df.rename(columns={'Security Name': 'Name'}, inplace=True)
-            
-            return combined_df
+            return ticker.fast_info.market_cap
         except Exception as e:
-            st.error(f"티커 리스트 다운로드 실패: {e}")
-            return pd.DataFrame()
+            if not is_rate_limited(e) or attempt == max_retries - 1:
+                return None
+            time.sleep(2 ** attempt)
 
-def get_ticker_info_batch(symbols, progress_callback=None):
-    """티커별 시가총액, 가격, 거래량 정보 가져오기"""
+def get_ticker_info_batch(symbols, progress_callback=None, chunk_size=200, max_workers=10):
+    """티커별 시가총액, 가격, 거래량 정보 가져오기 (가격은 배치 요청, 시가총액은 동시 요청)"""
     ticker_info = []
     failed_tickers = []
+    processed = 0
+    last_report = 0.0
     
-    for i, symbol in enumerate(symbols):
+    for chunk_start in range(0, len(symbols), chunk_size):
+        chunk = symbols[chunk_start:chunk_start + chunk_size]
+        
+        # 최근 5일 가격/거래량을 한 번에 요청
         try:
-            ticker = yf.Ticker(symbol)
-            info = ticker.info
-            
-            # 빠른 히스토리 데이터로 최근 가격/거래량 확인
-            hist = ticker.history(period="5d")
+            prices = download_with_backoff(
+                chunk,
+                period="5d",
+                group_by='ticker',
+                auto_adjust=True,
+                threads=True,
+                progress=False
+            )
+        except Exception as e:
+            prices = pd.DataFrame()
+        
+        quotes = {}
+        for symbol in chunk:
+            hist = get_symbol_frame(prices, symbol) if not prices.empty else None
             
-            if not hist.empty:
-                last_price = hist['Close'].iloc[-1]
-                avg_volume = hist['Volume'].mean()
-                market_cap = info.get('marketCap', 0)
-                
-                ticker_info.append({
-                    'Symbol': symbol,
-                    'Name': info.get('longName', info.get('shortName', symbol)),
-                    'Last Sale': last_price,
-                    'Market Cap': market_cap,
-                    'Volume': avg_volume
-                })
+            if hist is not None and not hist.empty:
+                quotes[symbol] = (hist['Close'].iloc[-1], hist['Volume'].mean())
             else:
                 failed_tickers.append(symbol)
+                processed += 1
+        
+        # 캐시된 Ticker 객체는 스크립트 스레드에서 미리 가져온 뒤 작업 스레드에 전달
+        # (yfinance는 ticker.ticker를 대문자로 바꾸므로 원래 심볼을 키로 사용)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(fetch_market_cap, get_ticker(symbol)): symbol for symbol in quotes}
+            
+            for future in as_completed(futures):
+                symbol = futures[future]
+                last_price, avg_volume = quotes[symbol]
+                market_cap = future.result()
                 
-        except Exception as e:
-            failed_tickers.append(symbol)
+                if market_cap is not None:
+                    ticker_info.append({
+                        'Symbol': symbol,
+                        'Last Sale': last_price,
+                        'Market Cap': market_cap,
+                        'Volume': avg_volume
+                    })
+                else:
+                    failed_tickers.append(symbol)
+                
+                # 진행 상황 콜백 (UI 갱신은 0.1초 간격으로 제한)
+                processed += 1
+                now = time.monotonic()
+                if progress_callback and now - last_report > 0.1:
+                    progress_callback(processed, len(symbols))
+                    last_report = now
         
-        # 진행 상황 콜백
         if progress_callback:
-            progress_callback(i + 1, len(symbols))
-        
-        # Rate limit 방지
-        if (i + 1) % 10 == 0:
-            time.sleep(1)
-        else:
-            time.sleep(0.1)
+            progress_callback(processed, len(symbols))
     
     return pd.DataFrame(ticker_info), failed_tickers
 
-def fetch_stock_data(symbol, start_date, end_date):
-    """주식 데이터 가져오기"""
-    try:
-        ticker = yf.Ticker(symbol)
-        df = ticker.history(start=start_date, end=end_date, interval='1d')
-        
-        if df.empty:
-            return None
-        
-        df.reset_index(inplace=True)
-        df['date'] = df['Date'].dt.strftime('%Y%m%d')
-        df.rename(columns={
-            'Open': 'open',
-            'High': 'high',
-            'Low': 'low',
-            'Close': 'close',
-            'Volume': 'Volume'
-        }, inplace=True)
-        
-        return df[['date', 'open', 'high', 'low', 'close', 'Volume']]
-        
-    except Exception as e:
+def format_stock_data(df):
+    """yfinance 히스토리를 date/open/high/low/close/Volume 형식으로 변환"""
+    if df.empty:
         return None
+    
+    # strftime 대신 정수 연산으로 YYYYMMDD 생성 (CSV 출력은 동일)
+    dates = df.index
+    
+    # 배치 내 다른 종목과 날짜를 맞추며 NaN이 채워지면 Volume이 float가 되므로 정수로 복원
+    volume = df['Volume']
+    if not volume.isna().any():
+        volume = volume.astype('int64')
+    
+    return pd.DataFrame({
+        'date': dates.year * 10000 + dates.month * 100 + dates.day,
+        'open': df['Open'].to_numpy(),
+        'high': df['High'].to_numpy(),
+        'low': df['Low'].to_numpy(),
+        'close': df['Close'].to_numpy(),
+        'Volume': volume.to_numpy()
+    })
+
+class IncompleteBatchError(Exception):
+    """배치 중 일부 종목 데이터를 받지 못함 (result에 성공한 종목만 담김)"""
+    
+    def __init__(self, result, missing):
+        super().__init__(f"{len(missing)}개 종목 데이터 없음: {', '.join(missing)}")
+        self.result = result
+        self.missing = missing
+
+@st.cache_data(persist="disk", max_entries=500, show_spinner=False)
+def fetch_stock_data_batch(symbols, start_date, end_date):
+    """여러 종목의 주식 데이터를 한 번의 배치 요청으로 가져오기
+    
+    symbols는 튜플, start_date/end_date는 date로 받아 (종목, 기간) 단위로 디스크 캐시됨.
+    end_date 당일 데이터까지 포함.
+    
+    yf.download는 종목별 실패(429 포함)를 예외 없이 빈 데이터로 돌려주므로,
+    한 종목이라도 비어 있으면 IncompleteBatchError를 발생시켜 실패 결과가 캐시되지 않게 함.
+    """
+    raw = download_with_backoff(
+        list(symbols),
+        start=start_date,
+        end=end_date + timedelta(days=1),
+        interval='1d',
+        group_by='ticker',
+        auto_adjust=True,
+        threads=True,
+        progress=False
+    )
+    
+    if raw is None or raw.empty:
+        raise IncompleteBatchError({}, list(symbols))
+    
+    result = {}
+    for symbol in symbols:
+        try:
+            df = get_symbol_frame(raw, symbol)
+            if df is None:
+                continue
+            
+            df = format_stock_data(df)
+            if df is not None:
+                result[symbol] = df
+        except Exception as e:
+            continue
+    
+    missing = [symbol for symbol in symbols if symbol not in result]
+    if missing:
+        raise IncompleteBatchError(result, missing)
+    
+    return result
 
-def create_download_zip(data_dict):
-    """여러 CSV 파일을 ZIP으로 압축"""
-    zip_buffer = BytesIO()
-    
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-        for filename, df in data_dict.items():
-            csv_buffer = BytesIO()
-            df.to_csv(csv_buffer, index=False, encoding='utf-8')
-            csv_buffer.seek(0)
-            zip_file.writestr(f"{filename}.csv", csv_buffer.getvalue())
-    
-    zip_buffer.seek(0)
-    return zip_buffer
+@st.cache_data(max_entries=8, show_spinner=False)
+def df_to_csv_bytes(df):
+    """DataFrame을 Arrow CSV writer(C++)로 UTF-8 CSV bytes로 변환 (같은 DataFrame이면 캐시 재사용)"""
+    buffer = pa.BufferOutputStream()
+    pacsv.write_csv(pa.Table.from_pandas(df, preserve_index=False), buffer)
+    return buffer.getvalue().to_pybytes()
+
+def create_download_zip(data_dict, output, file_format='parquet'):
+    """여러 종목 데이터를 ZIP으로 묶기 (output 파일에 직접 기록)
+    
+    file_format='parquet'이면 Snappy 압축 Parquet을 무압축(ZIP_STORED)으로 저장하고,
+    'csv'이면 기존 CSV 형식을 ZIP_DEFLATED로 압축.
+    """
+    if file_format == 'parquet':
+        with zipfile.ZipFile(output, 'w', zipfile.ZIP_STORED) as zip_file:
+            for filename, df in data_dict.items():
+                # Parquet은 이미 압축되어 있으므로 ZIP에서 다시 압축하지 않음
+                zip_file.writestr(f"{filename}.parquet", df.to_parquet(compression='snappy', index=False))
+    else:
+        with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+            for filename, df in data_dict.items():
+                # 중간 버퍼 없이 ZIP 멤버에 바로 CSV 기록 (기존 to_csv 형식 유지)
+                with zip_file.open(f"{filename}.csv", 'w') as member:
+                    df.to_csv(member, index=False, encoding='utf-8')
+    
+    output.flush()
+    return output
 
 # Streamlit UI
 st.title("📊 Stock Data Fetcher Pro")
@@ -178,7 +367,11 @@ with tab1:
     
     with col1:
         if st.button("🔄 티커 리스트 다운로드", type="primary", key="download_tickers"):
-            ticker_df = download_nasdaq_tickers()
+            try:
+                ticker_df = download_nasdaq_tickers(datetime.now().strftime('%Y%m%d'))
+            except Exception as e:
+                st.error(f"티커 리스트 다운로드 실패: {e}")
+                ticker_df = pd.DataFrame()
             
             if not ticker_df.empty:
                 st.session_state.ticker_df = ticker_df
@@ -193,7 +386,7 @@ with tab1:
             st.dataframe(st.session_state.ticker_df.head(10))
             
             # CSV 다운로드
-            csv = st.session_state.ticker_df.to_csv(index=False)
+            csv = df_to_csv_bytes(st.session_state.ticker_df)
             st.download_button(
                 label="💾 티커 리스트 CSV 다운로드",
                 data=csv,
@@ -234,12 +427,8 @@ with tab2:
             
             if not info_df.empty:
                 # 원본 티커 정보와 병합
-                merged_df = st.session_state.ticker_df.merge(info_df, on='Symbol', how='inner', suffixes=('', '_info'))
-                
-                # Name 컬럼 처리
-                if 'Name_info' in merged_df.columns:
-                    merged_df['Name'] = merged_df['Name_info'].fillna(merged_df['Name'])
-                    merged_df.drop('Name_info', axis=1, inplace=True)
+                # info_df에는 Name이 없으므로 컬럼 충돌 없이 그대로 병합
+                merged_df = st.session_state.ticker_df.merge(info_df, on='Symbol', how='inner')
                 
                 # 필터링
                 filtered_df = merged_df[
@@ -258,7 +447,7 @@ with tab2:
                     st.dataframe(filtered_df[['Symbol', 'Name', 'Last Sale', 'Market Cap', 'Volume']].head(20))
                     
                     # nasdaq_data.csv 형식으로 다운로드
-                    csv = filtered_df.to_csv(index=False)
+                    csv = df_to_csv_bytes(filtered_df)
                     st.download_button(
                         label="💾 nasdaq_data.csv 다운로드",
                         data=csv,
@@ -272,7 +461,7 @@ with tab2:
                 # 필터링 전 데이터도 다운로드 가능하게
                 st.subheader("전체 수집 데이터")
                 st.info(f"필터링 전 전체: {len(merged_df)}개 종목")
-                csv_all = merged_df.to_csv(index=False)
+                csv_all = df_to_csv_bytes(merged_df)
                 st.download_button(
                     label="💾 전체 데이터 다운로드 (필터링 전)",
                     data=csv_all,
@@ -304,61 +493,101 @@ with tab3:
             else:
                 selected_symbols = st.session_state.filtered_df['Symbol'].tolist()
         
+        export_csv = st.checkbox("CSV 형식으로 저장 (레거시, 기본은 Parquet)", value=False)
+        
         if st.button("🚀 주식 데이터 다운로드", type="primary", key="download_stocks"):
             if selected_symbols:
                 # 날짜 설정
-                end_date = datetime.now()
+                end_date = datetime.now().date()
                 start_date = end_date - timedelta(days=365 * years_back)
                 
                 st.info(f"기간: {start_date.strftime('%Y-%m-%d')} ~ {end_date.strftime('%Y-%m-%d')}")
                 
-                progress_bar = st.progress(0)
-                status_text = st.empty()
+                # 같은 기간에 이미 받은 종목은 세션에서 재사용하고 새 종목만 요청
+                period = (start_date, end_date)
+                if st.session_state.stock_data_period != period:
+                    st.session_state.stock_data = {}
+                    st.session_state.stock_data_period = period
+                stock_data = st.session_state.stock_data
                 
-                successful_data = {}
+                successful_data = {symbol: stock_data[symbol] for symbol in selected_symbols if symbol in stock_data}
+                new_symbols = [symbol for symbol in selected_symbols if symbol not in stock_data]
                 failed_list = []
                 
-                # 데이터 다운로드
-                for i, symbol in enumerate(selected_symbols):
-                    df = fetch_stock_data(symbol, start_date, end_date)
+                if successful_data:
+                    st.info(f"이미 받은 {len(successful_data)}개 종목은 재사용, {len(new_symbols)}개 종목만 새로 다운로드")
+                
+                # 상태/로그 표시 영역은 미리 한 번만 만들고 매번 덮어쓰기
+                progress_bar = st.progress(0)
+                status_slot = st.empty()
+                log_slot = st.empty()
+                batch_count = -(-len(new_symbols) // batch_size)
+                
+                # 종목별 결과는 모아서 일정 간격으로만 표시
+                log_rows = []
+                last_tick = 0.0
+                
+                # 데이터 다운로드 (배치 단위로 한 번에 요청)
+                for batch_index, batch_start in enumerate(range(0, len(new_symbols), batch_size), 1):
+                    batch = new_symbols[batch_start:batch_start + batch_size]
+                    batch_end = batch_start + len(batch)
                     
-                    if df is not None:
-                        successful_data[symbol] = df
-                        st.success(f"✓ {symbol}: {len(df)}행")
-                    else:
-                        failed_list.append(symbol)
-                        st.error(f"✗ {symbol}: 실패")
+                    # 진행 상황 (UI 갱신은 0.1초 간격으로 제한)
+                    now = time.monotonic()
+                    if now - last_tick > 0.1:
+                        progress_bar.progress(batch_start / len(new_symbols))
+                        batch_label = batch[0] if len(batch) == 1 else f"{batch[0]} 외 {len(batch) - 1}개"
+                        status_slot.markdown(f"**배치 {batch_index}/{batch_count}** - {batch_label} 처리 중... ({batch_end}/{len(new_symbols)})")
+                        last_tick = now
                     
-                    # 진행 상황
-                    progress = (i + 1) / len(selected_symbols)
-                    progress_bar.progress(progress)
-                    status_text.text(f"{symbol} 처리 중... ({i+1}/{len(selected_symbols)})")
+                    try:
+                        batch_data = fetch_stock_data_batch(tuple(batch), start_date, end_date)
+                    except IncompleteBatchError as e:
+                        # 성공한 종목만 사용 (세션에 저장되어 다음 실행에서는 실패 종목만 재요청)
+                        batch_data = e.result
+                    except Exception as e:
+                        batch_data = {}
                     
-                    # Rate limit
-                    if (i + 1) % 10 == 0:
-                        time.sleep(1)
-                    else:
-                        time.sleep(0.1)
+                    for symbol in batch:
+                        df = batch_data.get(symbol)
+                        
+                        if df is not None:
+                            successful_data[symbol] = df
+                            stock_data[symbol] = df
+                            log_rows.append((symbol, f"✓ {len(df)}행"))
+                        else:
+                            failed_list.append(symbol)
+                            log_rows.append((symbol, "✗ 실패"))
+                    
+                    # 배치 결과 처리는 I/O 없이 끝나므로 로그는 배치마다 한 번만 갱신
+                    log_slot.dataframe(pd.DataFrame(log_rows, columns=['Symbol', '결과']))
+                
+                progress_bar.progress(1.0)
                 
-                # 세션에 저장
-                st.session_state.stock_data = successful_data
+                if log_rows:
+                    log_slot.dataframe(pd.DataFrame(log_rows, columns=['Symbol', '결과']))
                 
                 # 결과
                 st.success(f"✅ 완료! 성공: {len(successful_data)}, 실패: {len(failed_list)}")
                 
                 # ZIP 다운로드
                 if successful_data:
-                    zip_buffer = create_download_zip(successful_data)
-                    
-                    st.download_button(
-                        label="💾 전체 데이터 ZIP 다운로드",
-                        data=zip_buffer,
-                        file_name=f"stock_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip",
-                        mime="application/zip"
-                    )
+                    # 메모리 대신 임시 파일에 ZIP 생성
+                    # (download_button은 BufferedRandom을 받지 않으므로 raw 파일 객체 전달)
+                    # download_button은 data를 한 번에 읽어 미디어 저장소에 올리므로
+                    # 제너레이터 기반 스트리밍 ZIP으로 바꿔도 최대 메모리는 줄지 않음
+                    with tempfile.TemporaryFile() as zip_file:
+                        create_download_zip(successful_data, zip_file, 'csv' if export_csv else 'parquet')
+                        
+                        st.download_button(
+                            label="💾 전체 데이터 ZIP 다운로드",
+                            data=zip_file.raw,
+                            file_name=f"stock_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip",
+                            mime="application/zip"
+                        )
                 
                 progress_bar.empty()
-                status_text.empty()
+                status_slot.empty()
             else:
                 st.warning("다운로드할 종목을 선택하세요!")
     else:
@@ -418,6 +647,6 @@ st.markdown("""
 
 ### 💡 팁
 - 샘플 모드로 먼저 테스트 후 전체 실행 권장
-- Rate limit 방지를 위해 자동으로 대기 시간 적용
+- Rate limit(429) 응답 시 자동으로 대기 후 재시도
 - 다운로드한 nasdaq_data.csv는 로컬 앱에서 바로 사용 가능
 """)
\ No newline at end of file
@@ -0,0 +1,32 @@
+import pandas as pd
+
+from streamlit_integrated_app import format_stock_data, get_symbol_frame
+
+
+def make_history(dates, volume):
+    index = pd.DatetimeIndex(pd.to_datetime(dates), name='Date')
+    return pd.DataFrame({
+        'Open': 1.0,
+        'High': 2.0,
+        'Low': 0.5,
+        'Close': 1.5,
+        'Volume': volume
+    }, index=index)
+
+
+def test_volume_stays_integer_when_batch_dates_differ():
+    # yf.download(group_by='ticker')처럼 날짜를 맞추면 NEW의 빠진 날짜는 NaN으로 채워짐
+    raw = pd.concat({
+        'OLD': make_history(['2024-01-02', '2024-01-03'], [100, 200]),
+        'NEW': make_history(['2024-01-03'], [300])
+    }, axis=1)
+    
+    old_df = format_stock_data(get_symbol_frame(raw, 'OLD'))
+    new_df = format_stock_data(get_symbol_frame(raw, 'NEW'))
+    
+    assert old_df['Volume'].dtype == 'int64'
+    assert new_df['Volume'].dtype == 'int64'
+    assert new_df.to_csv(index=False) == (
+        "date,open,high,low,close,Volume\n"
+        "20240103,1.0,2.0,0.5,1.5,300\n"
+    )